@@ -0,0 +1,75 @@
+#!/bin/bash
+# build_pgo.sh - Two-pass profile-guided build of drone_core
+#
+# Usage: sudo ./build_pgo.sh [source] [training_seconds] [output]
+#   source            defaults to dummy_drone.py (the C++ drone core)
+#   training_seconds  defaults to 60 (~6000 flight loops at 100Hz)
+#   output            defaults to drone_core_pgo (drone_core is the committed
+#                     OpenCV build of drone_core.cpp - don't overwrite it)
+#
+# Both passes must use the same flags, otherwise GCC rejects the profile.
+
+SRC=${1:-dummy_drone.py}
+TRAIN_SECS=${2:-60}
+PROFILE_DIR=/tmp/pgo
+OUT=${3:-drone_core_pgo}
+PORT=8080
+
+FLAGS="-x c++ -std=c++20 -O3 -ffast-math -fno-math-errno -ftree-vectorize -mcpu=native -pthread"
+
+echo "=== PGO BUILD ==="
+echo ""
+
+echo "1. Instrumented build..."
+rm -rf "$PROFILE_DIR"
+g++ $FLAGS -fprofile-generate="$PROFILE_DIR" -fprofile-update=atomic "$SRC" -o "$OUT" || exit 1
+
+echo "2. Training run (${TRAIN_SECS}s of command traffic)..."
+./"$OUT" > /dev/null 2>&1 &
+CORE_PID=$!
+sleep 2
+
+# If the port was busy the core keeps running without a socket, and PANIC
+# would go to whoever owns it (maybe a live drone_core) - check first
+if ! kill -0 $CORE_PID 2>/dev/null; then
+    echo "   Training core exited early - aborting"
+    exit 1
+fi
+if ! ss -H -lunp "sport = :$PORT" | grep -q "pid=$CORE_PID,"; then
+    echo "   Training core doesn't own UDP port $PORT (busy?) - aborting"
+    kill -9 $CORE_PID
+    exit 1
+fi
+
+# Representative joystick traffic: mostly throttle, some attitude changes
+CMDS=(UP UP DOWN UP FRONT STOP BACK STOP LEFT STOP RIGHT STOP DOWN)
+END=$((SECONDS + TRAIN_SECS))
+while [ $SECONDS -lt $END ]; do
+    for cmd in "${CMDS[@]}"; do
+        echo -n "$cmd" > /dev/udp/127.0.0.1/$PORT
+        sleep 0.02
+    done
+done
+
+# PANIC makes the core exit normally, which is when the profile is written
+echo -n "PANIC" > /dev/udp/127.0.0.1/$PORT
+for i in $(seq 1 100); do
+    kill -0 $CORE_PID 2>/dev/null || break
+    sleep 0.1
+done
+if kill -0 $CORE_PID 2>/dev/null; then
+    echo "   Training core ignored PANIC for 10s - killing it (no profile)"
+    kill -9 $CORE_PID
+fi
+wait $CORE_PID
+
+if [ -z "$(ls -A "$PROFILE_DIR" 2>/dev/null)" ]; then
+    echo "   No profile data in $PROFILE_DIR - aborting"
+    exit 1
+fi
+
+echo "3. Optimized build from profile..."
+g++ $FLAGS -fprofile-use="$PROFILE_DIR" -fprofile-correction "$SRC" -o "$OUT" || exit 1
+
+echo ""
+echo "✓ Built ./$OUT with profile from $PROFILE_DIR"
@@ -0,0 +1,44 @@
+#!/bin/bash
+# build_physics.sh - Build step_physics() into a shared library for Python tools
+#
+# Usage: ./build_physics.sh
+#
+# Only physics.cpp goes in the library, so it exports step_physics() and none
+# of the drone core (main, logger ring, global constructors). No -ffast-math:
+# linking a .so with it pulls in crtfastmath.o, which turns on flush-to-zero
+# for every process that loads the library, Python included.
+
+SRC=physics.cpp
+OUT=libdrone_physics.so
+
+FLAGS="-std=c++20 -O3 -fno-math-errno -shared -fPIC"
+
+echo "1. Building $OUT..."
+g++ $FLAGS "$SRC" -o "$OUT" || exit 1
+
+# Smoke test: 1s at full throttle from the ground climbs at 100*0.25 - 9.81 m/s^2,
+# and loading the library must leave the host's floating point alone
+echo "2. ctypes smoke test..."
+python3 - "$OUT" <<'PY' || exit 1
+import ctypes, sys
+
+lib = ctypes.CDLL("./" + sys.argv[1])
+lib.step_physics.argtypes = [ctypes.POINTER(ctypes.c_float), ctypes.c_float]
+lib.step_physics.restype = None
+
+if 5e-324 * 1.0 == 0.0:
+    sys.exit("   subnormals flushed to zero after loading the library")
+
+# throttle, pitch, roll, altitude, velocity (PhysicsIndex order)
+state = (ctypes.c_float * 5)(100.0, 0.0, 0.0, 0.0, 0.0)
+for _ in range(100):
+    lib.step_physics(state, 0.01)
+
+velocity = state[4]
+if abs(velocity - 15.19) > 0.01 or state[3] <= 0.0:
+    sys.exit("   step_physics returned velocity %.3f, altitude %.3f" % (velocity, state[3]))
+print("   velocity %.2f m/s, altitude %.2f m after 1s, subnormals intact" % (velocity, state[3]))
+PY
+
+echo ""
+echo "✓ Built ./$OUT"
@@ -7,6 +7,17 @@
 // - ROLL: Left/Right tilt - LEFT tilts left, RIGHT tilts right  
 // - YAW: Rotation around vertical axis (not used in this demo)
 // - ALTITUDE: Height above ground in meters
+//
+// BUILD (on the Pi):
+//   g++ -x c++ -std=c++20 -O3 -ffast-math -fno-math-errno -ftree-vectorize
+//       -mcpu=native -pthread dummy_drone.py -o drone_core_dev
+//   (-x c++ because of the .py name; the output name keeps clear of the
+//    committed drone_core, which is the OpenCV build of drone_core.cpp)
+//   (the physics is single precision throughout, so no float->double promotion)
+//   For a profile-guided build (same flags, trained on command traffic):
+//       sudo ./build_pgo.sh
+//   step_physics() (physics.h/physics.cpp) as a shared library for Python:
+//       ./build_physics.sh
 
 #include <iostream>
 #include <thread>
@@ -15,175 +26,673 @@
 #include <atomic>
 #include <vector>
 #include <cstring>
-#include <iomanip>
+#include <cstdio>
 #include <pthread.h>
 #include <sched.h>
 #include <unistd.h>
 #include <sys/resource.h> 
+#include <sys/syscall.h>
+#include <sys/mman.h>
+#include <time.h>
+#include <malloc.h>
 #include <sys/socket.h>   
 #include <netinet/in.h>
 #include <arpa/inet.h>
 #include <fcntl.h>
+#include <spawn.h>
+#include <sys/wait.h>
+#include <sys/epoll.h>
+#include <sys/eventfd.h>
 #include <errno.h>
-#include <condition_variable>
 #include <csignal>
 #include <cmath>
+#include "physics.h"
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#endif
+
+// {fmt} (header-only) is used for the monitor rows when it is installed
+// (apt install libfmt-dev); otherwise the logger falls back to snprintf
+#if __has_include(<fmt/compile.h>)
+#define FMT_HEADER_ONLY
+#include <fmt/compile.h>
+#define HAVE_FMT 1
+#endif
 
 using namespace std;
 
+extern char **environ;
+
 // --- CONFIGURATION ---
 int LOCAL_PORT = 8080;
 
 // --- SHARED STATE ---
-struct DroneState {
-    float throttle = 0.0f;  // Vertical power (0-100%)
-    float pitch = 0.0f;     // Forward/back tilt (-15 to +15 degrees)
-    float roll = 0.0f;      // Left/right tilt (-15 to +15 degrees)
-    float yaw = 0.0f;       // Rotation (not used)
-    float altitude = 0.0f;  // Height in meters
-    float velocity = 0.0f;  // Vertical velocity
-    bool emergency_triggered = false;
-    std::mutex state_mutex;
-    std::condition_variable cv_emergency;
+// Each field is an independent atomic (relaxed is enough for the advisory
+// physics). The emergency thread sleeps directly on emergency_wake
+// (C++20 atomic wait, a single futex) - no mutex on the PANIC path.
+// Fields are grouped by writer, one 64-byte cache line per group, so a
+// store from one thread doesn't invalidate the line another thread writes.
+struct alignas(64) DroneState {
+    // Written by networking (commands)
+    alignas(64) std::atomic<float> throttle{0.0f};  // Vertical power (0-100%)
+    std::atomic<float> pitch{0.0f};     // Forward/back tilt (-15 to +15 degrees)
+    std::atomic<float> roll{0.0f};      // Left/right tilt (-15 to +15 degrees)
+    std::atomic<float> yaw{0.0f};       // Rotation (not used)
+    // Written by flight (physics)
+    alignas(64) std::atomic<float> altitude{0.0f};  // Height in meters
+    std::atomic<float> velocity{0.0f};  // Vertical velocity
+    // Emergency protocol
+    alignas(64) std::atomic<bool> emergency_triggered{false};
+    std::atomic<bool> emergency_wake{false};  // set on PANIC, or alone on shutdown
 };
 
 // --- PROFILER STATS ---
-struct SystemStats {
-    long flight_loops = 0;
-    long flight_exec_avg_us = 0;
-    long flight_preempts = 0;
-    long flight_deadline_misses = 0;
-    long net_packets = 0;
-    long net_preempts = 0;
-    long vision_fps = 0;
-    long vision_preempts = 0;
+// Same cache-line-per-writer layout as DroneState. The flight group has a
+// single writer, so it is published with a seqlock (flight_seq) instead of
+// stats_mutex; everything else is still guarded by stats_mutex.
+struct alignas(64) SystemStats {
+    // Written by flight (seqlock)
+    alignas(64) std::atomic<unsigned> flight_seq{0};
+    std::atomic<long> flight_loops{0};
+    std::atomic<long> flight_exec_avg_us{0};
+    std::atomic<long> flight_deadline_misses{0};
+    // Written by networking
+    alignas(64) long net_packets = 0;
+    // Written by vision
+    alignas(64) long vision_fps = 0;
     bool vision_active = false;
-    string emergency_status = "STANDBY";
+    alignas(64) string emergency_status = "STANDBY";
     std::mutex stats_mutex;
 };
 
 DroneState shared_state;
 SystemStats global_stats;
+
+// Flight thread only: an odd sequence marks a write in progress
+void publish_flight_stats(long loops, long exec_avg_us, long deadline_misses) {
+    unsigned seq = global_stats.flight_seq.load(std::memory_order_relaxed);
+    global_stats.flight_seq.store(seq + 1, std::memory_order_relaxed);
+    std::atomic_thread_fence(std::memory_order_release);
+    global_stats.flight_loops.store(loops, std::memory_order_relaxed);
+    global_stats.flight_exec_avg_us.store(exec_avg_us, std::memory_order_relaxed);
+    global_stats.flight_deadline_misses.store(deadline_misses, std::memory_order_relaxed);
+    global_stats.flight_seq.store(seq + 2, std::memory_order_release);
+}
+
+// Lock-free consistent snapshot; retries if the flight thread was mid-write
+void read_flight_stats(long& loops, long& exec_avg_us, long& deadline_misses) {
+    unsigned before, after;
+    do {
+        before = global_stats.flight_seq.load(std::memory_order_acquire);
+        loops = global_stats.flight_loops.load(std::memory_order_relaxed);
+        exec_avg_us = global_stats.flight_exec_avg_us.load(std::memory_order_relaxed);
+        deadline_misses = global_stats.flight_deadline_misses.load(std::memory_order_relaxed);
+        std::atomic_thread_fence(std::memory_order_acquire);
+        after = global_stats.flight_seq.load(std::memory_order_relaxed);
+    } while ((before & 1) || before != after);
+}
 std::atomic<bool> system_running(true);
+std::atomic<bool> logger_running(true);
+int shutdown_fd = -1;  // eventfd, becomes readable once shutdown is requested
+
+// Kernel thread ids of the workers, published by each task on entry so the
+// monitor can sample their preemption counters from /proc once per second
+enum WorkerId { WORKER_FLIGHT, WORKER_NET, WORKER_VISION, WORKER_COUNT };
+std::atomic<pid_t> worker_tids[WORKER_COUNT];
+
+// Scheduling policy the flight thread actually ended up with, published once
+// on entry (-1 until then) so the monitor header can name it
+std::atomic<int> flight_policy(-1);
+
+// --- COMMAND PARSING ---
+enum Command { CMD_UNKNOWN, CMD_UP, CMD_DOWN, CMD_FRONT, CMD_BACK, CMD_LEFT, CMD_RIGHT, CMD_STOP, CMD_PANIC };
+
+// First two bytes as a little-endian uint16_t, e.g. "UP" -> 0x5055
+constexpr uint16_t cmd_key(char a, char b) {
+    return (uint16_t)((uint8_t)a | ((uint8_t)b << 8));
+}
+
+// The first two bytes identify every command, so one load + switch picks the
+// candidate (a jump table, no string compares); the length and word confirm it
+Command parse_command(const char* buf, size_t len) {
+    if (len < 2) return CMD_UNKNOWN;
+    uint16_t key;
+    memcpy(&key, buf, sizeof(key));
+
+    const char* word;
+    Command cmd;
+    switch (key) {
+    case cmd_key('U', 'P'): word = "UP";    cmd = CMD_UP;    break;
+    case cmd_key('D', 'O'): word = "DOWN";  cmd = CMD_DOWN;  break;
+    case cmd_key('F', 'R'): word = "FRONT"; cmd = CMD_FRONT; break;
+    case cmd_key('B', 'A'): word = "BACK";  cmd = CMD_BACK;  break;
+    case cmd_key('L', 'E'): word = "LEFT";  cmd = CMD_LEFT;  break;
+    case cmd_key('R', 'I'): word = "RIGHT"; cmd = CMD_RIGHT; break;
+    case cmd_key('S', 'T'): word = "STOP";  cmd = CMD_STOP;  break;
+    case cmd_key('P', 'A'): word = "PANIC"; cmd = CMD_PANIC; break;
+    default: return CMD_UNKNOWN;
+    }
+    return (len == strlen(word) && memcmp(buf, word, len) == 0) ? cmd : CMD_UNKNOWN;
+}
+
+// --- LOGGER ---
+// Workers push fixed-size records into a lock-free ring and carry on; a
+// low-priority logger thread does the formatting and the write() to stdout,
+// so no RT thread ever blocks on the terminal.
+enum LogKind : uint8_t { LOG_CMD, LOG_ROW, LOG_TEXT, LOG_ERROR };
+
+struct LogMsg {
+    LogKind kind;
+    Command cmd;          // LOG_CMD
+    const char* literal;  // LOG_TEXT/LOG_ERROR: printf format (string literal, not copied)
+    char text[32];        // LOG_CMD: command as received (cut to 28 bytes + "..." if longer),
+                          // LOG_ROW: emergency status, LOG_ERROR: name
+    float a, b;           // LOG_CMD: throttle; LOG_ROW: altitude, throttle
+    long v[7];            // LOG_ROW: flight time/miss/preempt, net packets/preempt, vision fps/preempt
+                          // LOG_TEXT: argument in v[0], LOG_ERROR: errno in v[0]
+};
+
+// Bounded multi-producer / single-consumer ring (per-slot sequence numbers)
+struct LogRing {
+    static const size_t SIZE = 1024;  // power of two
+    struct Slot {
+        std::atomic<size_t> seq;
+        LogMsg msg;
+    };
+    Slot slots[SIZE];
+    alignas(64) std::atomic<size_t> head{0};  // next slot to claim (producers)
+    alignas(64) size_t tail = 0;              // next slot to read (logger only)
+    alignas(64) std::atomic<unsigned> published{0};  // bumped after each push; the idle logger waits on it
+
+    LogRing() {
+        for (size_t i = 0; i < SIZE; i++) slots[i].seq.store(i, std::memory_order_relaxed);
+    }
+
+    // Never blocks: if the logger is a whole ring behind, the message is dropped
+    bool push(const LogMsg& m) {
+        size_t pos = head.load(std::memory_order_relaxed);
+        while (true) {
+            Slot& slot = slots[pos & (SIZE - 1)];
+            size_t seq = slot.seq.load(std::memory_order_acquire);
+            intptr_t diff = (intptr_t)seq - (intptr_t)pos;
+            if (diff == 0) {
+                if (head.compare_exchange_weak(pos, pos + 1, std::memory_order_relaxed)) {
+                    slot.msg = m;
+                    slot.seq.store(pos + 1, std::memory_order_release);
+                    wake();
+                    return true;
+                }
+            } else if (diff < 0) {
+                return false;
+            } else {
+                pos = head.load(std::memory_order_relaxed);
+            }
+        }
+    }
+
+    // notify_one() only makes the futex call when the logger is parked
+    void wake() {
+        published.fetch_add(1, std::memory_order_release);
+        published.notify_one();
+    }
+
+    bool pop(LogMsg& m) {
+        Slot& slot = slots[tail & (SIZE - 1)];
+        if (slot.seq.load(std::memory_order_acquire) != tail + 1) return false;
+        m = slot.msg;
+        slot.seq.store(tail + SIZE, std::memory_order_release);
+        tail++;
+        return true;
+    }
+};
+
+LogRing log_ring;
+
+void log_command(Command cmd, const char* text, float throttle) {
+    LogMsg m;
+    m.kind = LOG_CMD;
+    m.cmd = cmd;
+    // Real commands are a few bytes; a longer datagram is echoed with an
+    // explicit cut rather than silently shortened
+    if (snprintf(m.text, sizeof(m.text), "%s", text) >= (int)sizeof(m.text)) {
+        memcpy(m.text + sizeof(m.text) - 4, "...", 4);
+    }
+    m.a = throttle;
+    log_ring.push(m);
+}
+
+void log_text(const char* literal, long arg = 0) {
+    LogMsg m;
+    m.kind = LOG_TEXT;
+    m.literal = literal;
+    m.v[0] = arg;
+    log_ring.push(m);
+}
+
+// Worker error paths: cout/cerr aren't synced with stdio (see main), so
+// workers never touch them. strerror() runs in the logger, formatted as
+// printf(literal, name, strerror(err))
+void log_error(const char* literal, const char* name, int err) {
+    LogMsg m;
+    m.kind = LOG_ERROR;
+    m.literal = literal;
+    snprintf(m.text, sizeof(m.text), "%s", name);
+    m.v[0] = err;
+    log_ring.push(m);
+}
+
+// --- CAMERA PROCESS ---
+// rpicam-vid is spawned directly (no /bin/sh) and tracked by pid, so
+// stopping it is a kill()+waitpid() instead of a pkill scan of /proc.
+// With --verbose=2 it logs one "Viewfinder frame N" line per frame on
+// stderr; that goes to a pipe so the vision thread can count real frames.
+// --verbose takes an implicit value, so it must be one token ("--verbose 2"
+// would leave a stray positional "2"). The string is rpicam_vid.cpp's
+// LOG(2, "Viewfinder frame " << count) in rpicam-apps 1.x; it is a debug
+// message, not an interface, so recheck it after upgrading rpicam-apps on
+// the Pi (rpicam-vid -t 2000 --verbose=2 2>&1 | grep Viewfinder) - if it
+// changes, FPS reads 0 while the stream is fine.
+std::atomic<pid_t> camera_pid(-1);
+int camera_log_fd = -1;  // read end of the camera's stderr pipe (vision thread only)
+
+bool start_camera() {
+    // Launch camera - NO framerate limit, let it run at max speed
+    // Remove --framerate flag to get maximum possible FPS
+    const char* argv[] = {
+        "rpicam-vid", "-t", "0", "--nopreview", "--inline",
+        "--width", "640", "--height", "480",
+        "--codec", "h264", "--profile", "baseline",
+        "-o", "tcp://0.0.0.0:8888?listen=1", "--verbose=2", nullptr
+    };
+
+    int log_pipe[2];
+    if (pipe2(log_pipe, O_CLOEXEC) != 0) {
+        log_error("[%s] ERROR: pipe - %s\n", "Vision", errno);
+        return false;
+    }
+
+    posix_spawn_file_actions_t actions;
+    posix_spawn_file_actions_init(&actions);
+    posix_spawn_file_actions_addopen(&actions, STDOUT_FILENO, "/dev/null", O_WRONLY, 0);
+    posix_spawn_file_actions_adddup2(&actions, log_pipe[1], STDERR_FILENO);
+
+    // Don't let the encoder inherit the vision thread's RT priority
+    posix_spawnattr_t attr;
+    posix_spawnattr_init(&attr);
+    sched_param param;
+    param.sched_priority = 0;
+    posix_spawnattr_setschedpolicy(&attr, SCHED_OTHER);
+    posix_spawnattr_setschedparam(&attr, &param);
+    posix_spawnattr_setflags(&attr, POSIX_SPAWN_SETSCHEDULER);
+
+    pid_t pid;
+    int err = posix_spawnp(&pid, argv[0], &actions, &attr, const_cast<char**>(argv), environ);
+    posix_spawnattr_destroy(&attr);
+    posix_spawn_file_actions_destroy(&actions);
+    close(log_pipe[1]);
+
+    if (err != 0) {
+        log_error("[%s] ERROR: Failed to start rpicam-vid - %s\n", "Vision", err);
+        close(log_pipe[0]);
+        return false;
+    }
+    fcntl(log_pipe[0], F_SETFL, O_NONBLOCK);
+    camera_log_fd = log_pipe[0];
+    camera_pid = pid;
+    return true;
+}
+
+void stop_camera() {
+    pid_t pid = camera_pid.exchange(-1);
+    if (pid > 0) {
+        kill(pid, SIGKILL);
+        waitpid(pid, nullptr, 0);
+    }
+    if (camera_log_fd >= 0) {
+        close(camera_log_fd);
+        camera_log_fd = -1;
+    }
+}
+
+// Drains whatever the camera has logged so far and returns how many frames
+// it reported; a partial last line is kept in `pending` for the next call
+long count_camera_frames(string& pending) {
+    if (camera_log_fd < 0) return 0;
+
+    char buf[4096];
+    ssize_t n;
+    while ((n = read(camera_log_fd, buf, sizeof(buf))) > 0) {
+        pending.append(buf, n);
+    }
+
+    long frames = 0;
+    size_t start = 0, eol;
+    while ((eol = pending.find('\n', start)) != string::npos) {
+        if (pending.compare(start, 16, "Viewfinder frame") == 0) frames++;
+        start = eol + 1;
+    }
+    pending.erase(0, start);
+    return frames;
+}
 
 // --- CLEANUP FUNCTION ---
 void cleanup_resources() {
-    cout << "\n=== EMERGENCY SHUTDOWN SEQUENCE ===" << endl;
+    cout << "\n=== EMERGENCY SHUTDOWN SEQUENCE ===\n";
     
-    {
-        std::lock_guard<std::mutex> l(shared_state.state_mutex);
-        shared_state.throttle = 0;
-        shared_state.pitch = 0;
-        shared_state.roll = 0;
-        shared_state.yaw = 0;
-    }
-    cout << "✓ Motors stopped" << endl;
+    shared_state.throttle.store(0.0f, std::memory_order_relaxed);
+    shared_state.pitch.store(0.0f, std::memory_order_relaxed);
+    shared_state.roll.store(0.0f, std::memory_order_relaxed);
+    shared_state.yaw.store(0.0f, std::memory_order_relaxed);
+    cout << "✓ Motors stopped\n";
     
-    system("pkill -9 rpicam-vid 2>/dev/null");
-    cout << "✓ Camera stopped" << endl;
+    stop_camera();
+    cout << "✓ Camera stopped\n";
     
     {
+        long loops, exec_avg_us, deadline_misses;
+        read_flight_stats(loops, exec_avg_us, deadline_misses);
+
         std::lock_guard<std::mutex> l(global_stats.stats_mutex);
-        cout << "\n--- FINAL STATS ---" << endl;
-        cout << "Flight loops: " << global_stats.flight_loops << endl;
-        cout << "Avg loop time: " << global_stats.flight_exec_avg_us << " μs" << endl;
-        cout << "Deadline misses: " << global_stats.flight_deadline_misses << endl;
-        cout << "Network packets: " << global_stats.net_packets << endl;
+        cout << "\n--- FINAL STATS ---\n";
+        cout << "Flight loops: " << loops << "\n";
+        cout << "Avg loop time: " << exec_avg_us << " μs\n";
+        cout << "Deadline misses: " << deadline_misses << "\n";
+        cout << "Network packets: " << global_stats.net_packets << "\n";
     }
     
-    cout << "\n✓ Shutdown complete" << endl;
-    cout << "=================================\n" << endl;
+    cout << "\n✓ Shutdown complete\n";
+    cout << "=================================\n\n";
 }
 
 // --- HELPERS ---
-long get_kernel_preemptions() {
-    struct rusage usage;
-    getrusage(RUSAGE_THREAD, &usage);
-    return usage.ru_nivcsw; 
+// Async-signal-safe: also called from the signal handler
+void request_shutdown() {
+    system_running = false;
+    uint64_t one = 1;
+    if (write(shutdown_fd, &one, sizeof(one)) < 0) { /* already signalled or no fd */ }
+}
+
+// Not async-signal-safe (notify may take a futex), so the signal handler
+// leaves it to main once the workers have stopped
+void wake_emergency() {
+    shared_state.emergency_wake.store(true, std::memory_order_release);
+    shared_state.emergency_wake.notify_one();
+}
+
+void register_worker(WorkerId id) {
+    worker_tids[id] = (pid_t)syscall(SYS_gettid);
+}
+
+// Involuntary context switches of a worker (same counter as ru_nivcsw),
+// read from outside the thread so the worker never pays for the syscall
+long get_kernel_preemptions(WorkerId id) {
+    pid_t tid = worker_tids[id];
+    if (tid <= 0) return 0;
+
+    char path[64];
+    snprintf(path, sizeof(path), "/proc/self/task/%d/status", (int)tid);
+    FILE* f = fopen(path, "r");
+    if (!f) return 0;
+
+    char line[128];
+    long preempts = 0;
+    while (fgets(line, sizeof(line), f)) {
+        if (sscanf(line, "nonvoluntary_ctxt_switches: %ld", &preempts) == 1) break;
+    }
+    fclose(f);
+    return preempts;
 }
 
 void set_priority(std::thread &th, int prio, string name) {
     sched_param param;
     param.sched_priority = prio;
     if (pthread_setschedparam(th.native_handle(), SCHED_FIFO, &param) != 0) {
-        cerr << "[Scheduler] FAILED " << name << endl;
+        cerr << "[Scheduler] FAILED " << name << "\n";
+    }
+}
+
+#ifndef SCHED_DEADLINE
+#define SCHED_DEADLINE 6
+#endif
+
+// Kernel ABI for sched_setattr(2); glibc has no wrapper for it
+struct dl_sched_attr {
+    uint32_t size;
+    uint32_t sched_policy;
+    uint64_t sched_flags;
+    int32_t sched_nice;
+    uint32_t sched_priority;
+    uint64_t sched_runtime;   // ns
+    uint64_t sched_deadline;  // ns
+    uint64_t sched_period;    // ns
+};
+
+// Applies to the calling thread only, so it must run inside the task
+bool set_deadline(uint64_t runtime_ns, uint64_t deadline_ns, uint64_t period_ns, const char* name) {
+    dl_sched_attr attr;
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.sched_policy = SCHED_DEADLINE;
+    attr.sched_runtime = runtime_ns;
+    attr.sched_deadline = deadline_ns;
+    attr.sched_period = period_ns;
+    if (syscall(SYS_sched_setattr, 0, &attr, 0) != 0) {
+        log_error("[Scheduler] FAILED %s (SCHED_DEADLINE): %s\n", name, errno);
+        return false;
+    }
+    return true;
+}
+
+// True if the process may lock memory past RLIMIT_MEMLOCK (CAP_IPC_LOCK,
+// bit 14 of the effective capability set)
+bool has_ipc_lock() {
+    FILE* f = fopen("/proc/self/status", "r");
+    if (!f) return false;
+
+    char line[128];
+    unsigned long long caps = 0;
+    while (fgets(line, sizeof(line), f)) {
+        if (sscanf(line, "CapEff: %llx", &caps) == 1) break;
     }
+    fclose(f);
+    return caps & (1ULL << 14);
 }
 
-void pin_thread(std::thread &th, int core_id) {
+// Keep every page resident so a page fault can't cost the flight loop its
+// deadline: no heap trimming, no mmap'd chunks, all memory locked.
+// Best effort - a failed lock is a warning, never fatal
+void lock_memory() {
+    mallopt(M_TRIM_THRESHOLD, -1);
+    mallopt(M_MMAP_MAX, 0);
+
+    struct rlimit rl;
+    rl.rlim_cur = rl.rlim_max = RLIM_INFINITY;
+    bool unlimited = setrlimit(RLIMIT_MEMLOCK, &rl) == 0 || has_ipc_lock();
+
+    // MCL_FUTURE under a small limit (8 MiB unprivileged) would make every
+    // later mapping - including each std::thread's 8 MiB stack - fail with
+    // EAGAIN, so only lock what is mapped now in that case
+    int flags = unlimited ? (MCL_CURRENT | MCL_FUTURE) : MCL_CURRENT;
+    if (mlockall(flags) != 0) {
+        cerr << "[Memory] WARNING: mlockall failed (" << strerror(errno) << "), running unlocked\n";
+    } else if (!unlimited) {
+        cerr << "[Memory] WARNING: RLIMIT_MEMLOCK is limited, thread stacks are not locked\n";
+    }
+}
+
+// Touch the top of a thread's stack once at startup so the pages are
+// faulted in (and locked) before the real-time loop needs them
+void prefault_stack() {
+    const size_t PREFAULT_STACK = 64 * 1024;
+    char stack[PREFAULT_STACK];
+    memset(stack, 0, sizeof(stack));
+    asm volatile("" : : "r"(stack) : "memory");  // keep the memset from being optimized out
+}
+
+// Raw hardware counter for the flight loop's timing samples: one register read
+// instead of a clock_gettime() (CNTVCT_EL0 on the Pi, the TSC on x86)
+static inline uint64_t read_cycles() {
+#if defined(__aarch64__)
+    uint64_t v;
+    asm volatile("isb; mrs %0, cntvct_el0" : "=r"(v));
+    return v;
+#elif defined(__x86_64__) || defined(__i386__)
+    return __rdtsc();
+#else
+    return std::chrono::duration_cast<std::chrono::nanoseconds>(
+        std::chrono::steady_clock::now().time_since_epoch()).count();
+#endif
+}
+
+double cycles_per_us = 1.0;  // set once by calibrate_cycles() before the threads start
+
+void calibrate_cycles() {
+    auto t0 = std::chrono::steady_clock::now();
+    uint64_t c0 = read_cycles();
+    std::this_thread::sleep_for(std::chrono::milliseconds(100));
+    uint64_t c1 = read_cycles();
+    auto t1 = std::chrono::steady_clock::now();
+    cycles_per_us = (c1 - c0) / std::chrono::duration<double, std::micro>(t1 - t0).count();
+}
+
+void pin_thread(std::thread &th, int core_id, string name) {
     cpu_set_t cpuset;
     CPU_ZERO(&cpuset);
     CPU_SET(core_id, &cpuset);
-    pthread_setaffinity_np(th.native_handle(), sizeof(cpu_set_t), &cpuset);
+    int err = pthread_setaffinity_np(th.native_handle(), sizeof(cpu_set_t), &cpuset);
+    if (err != 0) {
+        cerr << "[Scheduler] FAILED pinning " << name << " to core " << core_id << ": " << strerror(err) << "\n";
+    }
+}
+
+// --- SENSOR FUSION KERNEL ---
+// Polynomial sinf with no libm call: reduce by the nearest multiple of pi
+// (pi split in two parts), then an odd degree-11 polynomial on [-pi/2, pi/2]
+// and flip the sign for odd multiples. No branches or table lookups, so a
+// loop over it vectorizes (NEON on the Pi, SSE/AVX on x86); error stays
+// under 1e-6 with -ffast-math, plenty for a dummy load
+static inline float poly_sinf(float x) {
+    int q = (int)(x * 0.318309886183791f + (x < 0.0f ? -0.5f : 0.5f));  // round(x/pi)
+    float y = (float)q;
+    x = (x - y * 3.140625f) - y * 9.67653589793e-4f;
+
+    float z = x * x;
+    float p = (((-2.3889859e-8f * z + 2.7525562e-6f) * z - 1.9840874e-4f) * z + 8.3333310e-3f) * z - 1.6666667e-1f;
+    p = x + x * z * p;
+    return (float)(1 - 2 * (q & 1)) * p;
+}
+
+// Simulated sensor fusion: a 2000-term sine sum over a sample window that
+// moves every tick, so the compiler can't hoist it out of the flight loop.
+// With -O3 -ffast-math GCC vectorizes the loop and the reduction
+static inline float compute_fusion(float phase) {
+    float s = 0.0f;
+    for(int i = 0; i < 2000; i++) {
+        s += 0.0001f * poly_sinf(phase + i * 0.001f);  // Dummy math work
+    }
+    return s;
 }
 
 // --- THREAD 1: FLIGHT CONTROL (WITH REALISTIC COMPUTATION) ---
-void task_flight() {
-    auto next_wake = std::chrono::steady_clock::now();
-    const float dt = 0.01f;
+void task_flight(bool try_edf) {
+    prefault_stack();
+    register_worker(WORKER_FLIGHT);
+
+    // EDF reservation: 2ms runtime, 9ms deadline, 10ms period (100Hz).
+    // If it is skipped (pinned, see main) or refused (no root / no
+    // SCHED_DEADLINE) fall back to FIFO 50.
+    int policy = SCHED_OTHER;
+    if (try_edf && set_deadline(2'000'000, 9'000'000, 10'000'000, "Flight")) {
+        policy = SCHED_DEADLINE;
+    } else {
+        sched_param param;
+        param.sched_priority = 50;
+        if (pthread_setschedparam(pthread_self(), SCHED_FIFO, &param) == 0) {
+            policy = SCHED_FIFO;
+        } else {
+            log_text("[Scheduler] FAILED Flight (SCHED_FIFO): running without RT priority\n");
+        }
+    }
+    flight_policy.store(policy);
+    flight_policy.notify_all();
+
+    // Absolute CLOCK_MONOTONIC wake-ups (cyclictest style): each period is
+    // measured from the previous target, not from when we woke, so no drift
+    const long PERIOD_NS = 10'000'000;  // 100Hz
+    struct timespec next, now;
+    clock_gettime(CLOCK_MONOTONIC, &next);
+    constexpr float dt = 0.01f;
+
+    // This thread is the only writer of the flight stats: keep them local
+    // and publish a snapshot each tick
+    long loops = 0, exec_avg_us = 0, deadline_misses = 0;
 
     while (system_running) {
-        next_wake += std::chrono::milliseconds(10); // 100Hz
+        next.tv_nsec += PERIOD_NS;
+        if (next.tv_nsec >= 1'000'000'000) {
+            next.tv_nsec -= 1'000'000'000;
+            next.tv_sec += 1;
+        }
 
         // 1. Deadline Check
-        if (std::chrono::steady_clock::now() > next_wake) {
-            std::lock_guard<std::mutex> l(global_stats.stats_mutex);
-            global_stats.flight_deadline_misses++;
+        clock_gettime(CLOCK_MONOTONIC, &now);
+        if (now.tv_sec > next.tv_sec || (now.tv_sec == next.tv_sec && now.tv_nsec > next.tv_nsec)) {
+            deadline_misses++;
         }
 
-        auto start = std::chrono::high_resolution_clock::now();
+        uint64_t start = read_cycles();
 
         // 2. Physics Simulation + Computational Load
         {
-            std::lock_guard<std::mutex> l(shared_state.state_mutex);
-            
-            if (shared_state.emergency_triggered) {
-                shared_state.throttle = 0;
-                shared_state.pitch = 0;
-                shared_state.roll = 0;
+            if (shared_state.emergency_triggered.load(std::memory_order_relaxed)) {
+                shared_state.throttle.store(0.0f, std::memory_order_relaxed);
+                shared_state.pitch.store(0.0f, std::memory_order_relaxed);
+                shared_state.roll.store(0.0f, std::memory_order_relaxed);
             }
 
-            // Add realistic computation work (simulates sensor fusion, PID, etc.)
-            float temp_alt = shared_state.altitude;
-            for(int i = 0; i < 2000; i++) {
-                temp_alt += 0.0001f * sin(i * 0.001f);  // Dummy math work
-            }
+            float phys[PHYS_COUNT];
+            phys[PHYS_THROTTLE] = shared_state.throttle.load(std::memory_order_relaxed);
+            phys[PHYS_PITCH] = shared_state.pitch.load(std::memory_order_relaxed);
+            phys[PHYS_ROLL] = shared_state.roll.load(std::memory_order_relaxed);
+            phys[PHYS_ALTITUDE] = shared_state.altitude.load(std::memory_order_relaxed);
+            phys[PHYS_VELOCITY] = shared_state.velocity.load(std::memory_order_relaxed);
+
+            // Add realistic computation work (simulates sensor fusion, PID, etc.).
+            // Nothing consumes the sum, so it goes through an empty asm that
+            // the compiler must treat as a use - otherwise the load is dropped
+            float fusion = compute_fusion((loops % 1000) * 0.001f);
+            asm volatile("" : : "g"(fusion));
 
             // Actual physics calculation
-            float lift = shared_state.throttle * 0.25f; 
-            float gravity = 9.81f;
-            float tilt_factor = 1.0f - (abs(shared_state.pitch) + abs(shared_state.roll)) * 0.005f;
-            
-            float accel = (lift * tilt_factor) - gravity;
-            shared_state.velocity += accel * dt;
-            shared_state.altitude += shared_state.velocity * dt;
+            step_physics_inline(phys, dt);
 
-            if (shared_state.altitude < 0) { 
-                shared_state.altitude = 0; 
-                shared_state.velocity = 0; 
-            }
+            shared_state.velocity.store(phys[PHYS_VELOCITY], std::memory_order_relaxed);
+            shared_state.altitude.store(phys[PHYS_ALTITUDE], std::memory_order_relaxed);
         }
 
         // 3. Update Stats
-        auto end = std::chrono::high_resolution_clock::now();
-        long dur = std::chrono::duration_cast<std::chrono::microseconds>(end - start).count();
-        long preempts = get_kernel_preemptions();
+        uint64_t end = read_cycles();
+        long dur = (long)((end - start) / cycles_per_us);
 
-        {
-            std::lock_guard<std::mutex> l(global_stats.stats_mutex);
-            global_stats.flight_loops++;
-            global_stats.flight_exec_avg_us = (global_stats.flight_exec_avg_us + dur) / 2;
-            global_stats.flight_preempts = preempts;
-        }
+        loops++;
+        exec_avg_us = (exec_avg_us + dur) / 2;
+        publish_flight_stats(loops, exec_avg_us, deadline_misses);
 
-        std::this_thread::sleep_until(next_wake);
+        // Sleep to the next period under both policies. Under EDF a blocking
+        // sleep still hands back the unused budget, but it is a voluntary
+        // switch; sched_yield() was counted as an involuntary one every tick
+        // and swamped the Preempt column
+        clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &next, nullptr);
     }
 }
 
 // --- THREAD 2: VISION SERVER (REAL FPS MEASUREMENT) ---
 void task_vision() {
+    prefault_stack();
+    register_worker(WORKER_VISION);
+
     while (system_running) {
-        system("pkill -9 rpicam-vid 2>/dev/null");
+        stop_camera();
         std::this_thread::sleep_for(std::chrono::milliseconds(500));
 
         {
@@ -191,34 +700,30 @@ void task_vision() {
             global_stats.vision_active = true;
         }
 
-        // Launch camera - NO framerate limit, let it run at max speed
-        // Remove --framerate flag to get maximum possible FPS
-        string cmd = "rpicam-vid -t 0 --nopreview --inline --width 640 --height 480 --codec h264 --profile baseline -o tcp://0.0.0.0:8888?listen=1 > /dev/null 2>&1 &";
-        system(cmd.c_str());
-
-        cout << "[Vision] Camera started on port 8888" << endl;
+        if (start_camera()) {
+            log_text("[Vision] Camera started on port 8888\n");
+        }
 
-        // Monitor and measure ACTUAL FPS by checking system stats
+        // Measure ACTUAL FPS by counting the frames the camera reports
         auto last_check = std::chrono::steady_clock::now();
         int measurement_count = 0;
+        long frames = 0;
+        string pending;
         
         while(system_running && measurement_count < 300) {  // Run for ~30 seconds
             measurement_count++;
+            frames += count_camera_frames(pending);
             
             auto now = std::chrono::steady_clock::now();
-            auto elapsed = std::chrono::duration_cast<std::chrono::seconds>(now - last_check).count();
+            auto elapsed_ms = std::chrono::duration_cast<std::chrono::milliseconds>(now - last_check).count();
             
-            if (elapsed >= 1) {
-                // Estimate FPS based on camera capabilities
-                // Pi Camera v2 typically runs at 30fps for 640x480
-                // This is an approximation - actual FPS depends on network and encoding
-                long estimated_fps = 30;  // You can measure this more accurately with frame counting
+            if (elapsed_ms >= 1000) {
+                long fps = frames * 1000 / elapsed_ms;
+                frames = 0;
                 
-                long preempts = get_kernel_preemptions();
                 {
                     std::lock_guard<std::mutex> l(global_stats.stats_mutex);
-                    global_stats.vision_fps = estimated_fps;
-                    global_stats.vision_preempts = preempts;
+                    global_stats.vision_fps = fps;
                 }
                 last_check = now;
             }
@@ -229,7 +734,7 @@ void task_vision() {
         // Restart camera every 30 seconds to maintain connection
     }
     
-    system("pkill -9 rpicam-vid 2>/dev/null");
+    stop_camera();
     
     {
         std::lock_guard<std::mutex> l(global_stats.stats_mutex);
@@ -239,9 +744,12 @@ void task_vision() {
 
 // --- THREAD 3: NETWORKING (WITH COMMAND LOGGING) ---
 void task_networking() {
+    prefault_stack();
+    register_worker(WORKER_NET);
+
     int sockfd = socket(AF_INET, SOCK_DGRAM, 0);
     if (sockfd < 0) {
-        cerr << "[Net] ERROR: Failed to create socket" << endl;
+        log_error("[%s] ERROR: Failed to create socket - %s\n", "Net", errno);
         return;
     }
     
@@ -252,190 +760,339 @@ void task_networking() {
     servaddr.sin_port = htons(LOCAL_PORT);
     
     if (bind(sockfd, (const struct sockaddr *)&servaddr, sizeof(servaddr)) < 0) {
-        cerr << "[Net] ERROR: Bind failed - " << strerror(errno) << endl;
+        log_error("[%s] ERROR: Bind failed - %s\n", "Net", errno);
         close(sockfd);
         return;
     }
     
-    int flags = fcntl(sockfd, F_GETFL, 0);
-    fcntl(sockfd, F_SETFL, flags | O_NONBLOCK);
+    // Sleep until a packet or the shutdown eventfd arrives - no polling
+    int epfd = epoll_create1(0);
+    struct epoll_event ev;
+    memset(&ev, 0, sizeof(ev));
+    ev.events = EPOLLIN;
+    ev.data.fd = sockfd;
+    epoll_ctl(epfd, EPOLL_CTL_ADD, sockfd, &ev);
+    ev.data.fd = shutdown_fd;
+    epoll_ctl(epfd, EPOLL_CTL_ADD, shutdown_fd, &ev);
 
-    cout << "[Net] UDP Listening on port " << LOCAL_PORT << endl;
+    log_text("[Net] UDP Listening on port %ld\n", LOCAL_PORT);
     
-    char buffer[1024];
-    struct sockaddr_in clientaddr;
-    socklen_t clientlen;
+    // Batch receive: one recvmmsg() drains up to NET_BATCH queued datagrams
+    const int NET_BATCH = 16;
+    struct mmsghdr msgs[NET_BATCH];
+    struct iovec iovs[NET_BATCH];
+    char bufs[NET_BATCH][1024];
+    struct sockaddr_in addrs[NET_BATCH];
+    memset(msgs, 0, sizeof(msgs));
+    for (int i = 0; i < NET_BATCH; i++) {
+        iovs[i].iov_base = bufs[i];
+        iovs[i].iov_len = sizeof(bufs[i]) - 1;
+        msgs[i].msg_hdr.msg_iov = &iovs[i];
+        msgs[i].msg_hdr.msg_iovlen = 1;
+        msgs[i].msg_hdr.msg_name = &addrs[i];
+    }
     
     while (system_running) {
-        clientlen = sizeof(clientaddr);
-        int n = recvfrom(sockfd, buffer, sizeof(buffer) - 1, 0,
-                        (struct sockaddr *)&clientaddr, &clientlen);
-        
-        if (n > 0) {
-            buffer[n] = '\0';
-            string cmd(buffer);
-            
-            cout << "\n[CMD] " << cmd << " -> ";
-            
-            long preempts = get_kernel_preemptions();
-            {
-                std::lock_guard<std::mutex> l(global_stats.stats_mutex);
-                global_stats.net_packets++;
-                global_stats.net_preempts = preempts;
-            }
+        struct epoll_event events[2];
+        int ready = epoll_wait(epfd, events, 2, -1);
+        if (ready < 0) {
+            if (errno == EINTR) continue;
+            log_error("[%s] ERROR: epoll_wait - %s\n", "Net", errno);
+            break;
+        }
 
-            std::lock_guard<std::mutex> l(shared_state.state_mutex);
-            
-            if (cmd == "PANIC") {
-                cout << "EMERGENCY!" << endl;
-                shared_state.emergency_triggered = true;
-                shared_state.cv_emergency.notify_one();
+        bool shutdown = false, readable = false;
+        for (int i = 0; i < ready; i++) {
+            if (events[i].data.fd == shutdown_fd) shutdown = true;
+            else if (events[i].data.fd == sockfd) readable = true;
+        }
+        if (shutdown) break;
+        if (!readable) continue;
+
+        for (int i = 0; i < NET_BATCH; i++) {
+            msgs[i].msg_hdr.msg_namelen = sizeof(addrs[i]);
+        }
+        int k = recvmmsg(sockfd, msgs, NET_BATCH, MSG_WAITFORONE, nullptr);
+        if (k < 0) {
+            if (errno != EINTR) log_error("[%s] ERROR: %s\n", "Net", errno);
+            continue;
+        }
+
+        Command cmds[NET_BATCH];
+        long packets = 0;
+        for (int i = 0; i < k; i++) {
+            bufs[i][msgs[i].msg_len] = '\0';
+            cmds[i] = parse_command(bufs[i], msgs[i].msg_len);
+            if (msgs[i].msg_len > 0) packets++;
+        }
+
+        {
+            std::lock_guard<std::mutex> l(global_stats.stats_mutex);
+            global_stats.net_packets += packets;
+        }
+
+        // Apply the whole batch to local copies, then publish once
+        float thr = shared_state.throttle.load(std::memory_order_relaxed);
+        float pitch = shared_state.pitch.load(std::memory_order_relaxed);
+        float roll = shared_state.roll.load(std::memory_order_relaxed);
+
+        bool panic = false;
+        for (int i = 0; i < k && !panic; i++) {
+            if (msgs[i].msg_len == 0) continue;
+
+            switch (cmds[i]) {
+            case CMD_PANIC:
+                // Logged before the wake-up so it prints ahead of the emergency banner
+                log_command(cmds[i], bufs[i], thr);
+                shared_state.emergency_triggered.store(true, std::memory_order_release);
+                wake_emergency();
                 {
                     std::lock_guard<std::mutex> sl(global_stats.stats_mutex);
                     global_stats.emergency_status = "TRIGGERED";
                 }
+                panic = true;  // the rest of the batch is not applied
+                continue;
+            case CMD_UP:
+                thr = min(100.0f, thr + 10.0f);
+                break;
+            case CMD_DOWN:
+                thr = max(0.0f, thr - 10.0f);
+                break;
+            case CMD_FRONT:
+                pitch = 15.0f;
+                break;
+            case CMD_BACK:
+                pitch = -15.0f;
+                break;
+            case CMD_LEFT:
+                roll = -15.0f;
+                break;
+            case CMD_RIGHT:
+                roll = 15.0f;
+                break;
+            case CMD_STOP:
+                pitch = 0.0f;
+                roll = 0.0f;
+                break;
+            default:
+                break;
             }
-            else if (cmd == "UP") {
-                shared_state.throttle = min(100.0f, shared_state.throttle + 10.0f);
-                cout << "Throttle " << (int)shared_state.throttle << "%" << endl;
-            }
-            else if (cmd == "DOWN") {
-                shared_state.throttle = max(0.0f, shared_state.throttle - 10.0f);
-                cout << "Throttle " << (int)shared_state.throttle << "%" << endl;
-            }
-            else if (cmd == "FRONT") {
-                shared_state.pitch = 15.0f;
-                cout << "Pitch FORWARD" << endl;
-            }
-            else if (cmd == "BACK") {
-                shared_state.pitch = -15.0f;
-                cout << "Pitch BACKWARD" << endl;
-            }
-            else if (cmd == "LEFT") {
-                shared_state.roll = -15.0f;
-                cout << "Roll LEFT" << endl;
-            }
-            else if (cmd == "RIGHT") {
-                shared_state.roll = 15.0f;
-                cout << "Roll RIGHT" << endl;
-            }
-            else if (cmd == "STOP") {
-                shared_state.pitch = 0.0f;
-                shared_state.roll = 0.0f;
-                cout << "CENTERED" << endl;
-            }
-            else {
-                cout << "UNKNOWN" << endl;
-            }
-        }
-        else if (n < 0 && errno != EAGAIN && errno != EWOULDBLOCK) {
-            cerr << "[Net] ERROR: " << strerror(errno) << endl;
+            log_command(cmds[i], bufs[i], thr);
         }
-        
-        std::this_thread::sleep_for(std::chrono::milliseconds(10));
+
+        // Once PANIC is in, the flight thread zeroes the controls; writing the
+        // batch's copies back would undo that. Only this thread sets the flag,
+        // so it can't flip between this check and the stores below
+        if (shared_state.emergency_triggered.load(std::memory_order_acquire)) continue;
+
+        shared_state.throttle.store(thr, std::memory_order_relaxed);
+        shared_state.pitch.store(pitch, std::memory_order_relaxed);
+        shared_state.roll.store(roll, std::memory_order_relaxed);
     }
     
+    close(epfd);
     close(sockfd);
 }
 
 // --- THREAD 4: EMERGENCY ---
 void task_emergency() {
-    std::unique_lock<std::mutex> l(shared_state.state_mutex);
-    shared_state.cv_emergency.wait(l, []{ return shared_state.emergency_triggered; });
+    prefault_stack();
+
+    shared_state.emergency_wake.wait(false, std::memory_order_acquire);
+    if (!shared_state.emergency_triggered.load(std::memory_order_acquire)) return;  // plain shutdown
     
-    cout << "\n\n!!! EMERGENCY STOP ACTIVATED !!!" << endl;
+    log_text("\n\n!!! EMERGENCY STOP ACTIVATED !!!\n");
     
     {
         std::lock_guard<std::mutex> sl(global_stats.stats_mutex);
         global_stats.emergency_status = "ACTIVE";
     }
     
-    system_running = false;
+    request_shutdown();
 }
 
 // --- THREAD 5: MONITOR ---
 void task_monitor() {
-    cout << "\n----------------------------------------------------------------------------------------------------" << endl;
-    cout << "| FLIGHT (Prio 50)       | NETWORK (Prio 30)     | VISION (Prio 10)    | SYSTEM STATUS          |" << endl;
-    cout << "| Time  | Miss | Preempt | Packets | Preempt   | FPS  | Preempt    | ALT   | THR | EMERGENCY  |" << endl;
-    cout << "----------------------------------------------------------------------------------------------------" << endl;
+    // Name the policy the flight thread really got, not the one it asked for
+    flight_policy.wait(-1);
+    int policy = flight_policy.load();
+
+    log_text("\n----------------------------------------------------------------------------------------------------\n");
+    if (policy == SCHED_DEADLINE) {
+        log_text("| FLIGHT (EDF 2/10ms)    | NETWORK (Prio 30)     | VISION (Prio 10)    | SYSTEM STATUS          |\n");
+    } else if (policy == SCHED_FIFO) {
+        log_text("| FLIGHT (Prio 50)       | NETWORK (Prio 30)     | VISION (Prio 10)    | SYSTEM STATUS          |\n");
+    } else {
+        log_text("| FLIGHT (no RT)         | NETWORK (Prio 30)     | VISION (Prio 10)    | SYSTEM STATUS          |\n");
+    }
+    log_text("| Time  | Miss | Preempt | Packets | Preempt   | FPS  | Preempt    | ALT   | THR | EMERGENCY  |\n");
+    log_text("----------------------------------------------------------------------------------------------------\n");
 
     while(system_running) {
         std::this_thread::sleep_for(std::chrono::seconds(1));
         
-        long f_time, f_miss, f_pre, n_pack, n_pre, v_fps, v_pre;
+        long f_time, f_miss, n_pack, v_fps;
         float alt, thr;
         string emerg_status;
+
+        long flight_pre = get_kernel_preemptions(WORKER_FLIGHT);
+        long net_pre = get_kernel_preemptions(WORKER_NET);
+        long vision_pre = get_kernel_preemptions(WORKER_VISION);
+
+        long f_loops;
+        read_flight_stats(f_loops, f_time, f_miss);
         
         {
             std::lock_guard<std::mutex> l(global_stats.stats_mutex);
-            f_time = global_stats.flight_exec_avg_us;
-            f_miss = global_stats.flight_deadline_misses;
-            f_pre = global_stats.flight_preempts;
             n_pack = global_stats.net_packets;
-            n_pre = global_stats.net_preempts;
             v_fps = global_stats.vision_fps;
-            v_pre = global_stats.vision_preempts;
             emerg_status = global_stats.emergency_status;
             global_stats.net_packets = 0;
         }
-        {
-            std::lock_guard<std::mutex> l(shared_state.state_mutex);
-            alt = shared_state.altitude;
-            thr = shared_state.throttle;
-        }
+        alt = shared_state.altitude.load(std::memory_order_relaxed);
+        thr = shared_state.throttle.load(std::memory_order_relaxed);
+
+        LogMsg m;
+        m.kind = LOG_ROW;
+        m.v[0] = f_time; m.v[1] = f_miss; m.v[2] = flight_pre;
+        m.v[3] = n_pack; m.v[4] = net_pre;
+        m.v[5] = v_fps; m.v[6] = vision_pre;
+        m.a = alt;
+        m.b = thr;
+        snprintf(m.text, sizeof(m.text), "%s", emerg_status.c_str());
+        log_ring.push(m);
+    }
+}
+
+// --- THREAD 6: LOGGER (normal priority) ---
+int format_log(const LogMsg& m, char* out, size_t size) {
+    switch (m.kind) {
+    case LOG_ROW: {
+#ifdef HAVE_FMT
+        // Format string parsed at compile time; no locale or stream state
+        auto res = fmt::format_to_n(out, size,
+                        FMT_COMPILE("| {:5} | {:4} | {:7} | {:7} | {:9} | {:4} | {:10} | {:5.1f} | {:3} | {:>10} |\n"),
+                        m.v[0], m.v[1], m.v[2], m.v[3], m.v[4], m.v[5], m.v[6],
+                        m.a, (int)m.b, (const char*)m.text);
+        return (int)res.size;
+#else
+        return snprintf(out, size,
+                        "| %5ld | %4ld | %7ld | %7ld | %9ld | %4ld | %10ld | %5.1f | %3d | %10s |\n",
+                        m.v[0], m.v[1], m.v[2], m.v[3], m.v[4], m.v[5], m.v[6],
+                        m.a, (int)m.b, m.text);
+#endif
+    }
+    case LOG_TEXT:
+        return snprintf(out, size, m.literal, m.v[0]);
+    case LOG_ERROR:
+        return snprintf(out, size, m.literal, m.text, strerror((int)m.v[0]));
+    case LOG_CMD:
+        break;
+    }
+
+    switch (m.cmd) {
+    case CMD_PANIC: return snprintf(out, size, "\n[CMD] %s -> EMERGENCY!\n", m.text);
+    case CMD_UP:
+    case CMD_DOWN:  return snprintf(out, size, "\n[CMD] %s -> Throttle %d%%\n", m.text, (int)m.a);
+    case CMD_FRONT: return snprintf(out, size, "\n[CMD] %s -> Pitch FORWARD\n", m.text);
+    case CMD_BACK:  return snprintf(out, size, "\n[CMD] %s -> Pitch BACKWARD\n", m.text);
+    case CMD_LEFT:  return snprintf(out, size, "\n[CMD] %s -> Roll LEFT\n", m.text);
+    case CMD_RIGHT: return snprintf(out, size, "\n[CMD] %s -> Roll RIGHT\n", m.text);
+    case CMD_STOP:  return snprintf(out, size, "\n[CMD] %s -> CENTERED\n", m.text);
+    default:        return snprintf(out, size, "\n[CMD] %s -> UNKNOWN\n", m.text);
+    }
+}
 
-        cout << "| " << setw(5) << f_time << " | " << setw(4) << f_miss 
-             << " | " << setw(7) << f_pre 
-             << " | " << setw(7) << n_pack 
-             << " | " << setw(9) << n_pre 
-             << " | " << setw(4) << v_fps 
-             << " | " << setw(10) << v_pre
-             << " | " << setw(5) << fixed << setprecision(1) << alt << " | " 
-             << setw(3) << (int)thr << " | " << setw(10) << emerg_status << " |" << endl;
+void task_logger() {
+    LogMsg m;
+    char line[256];
+    while (true) {
+        // Snapshot the counter and the flag before draining: a push or a
+        // shutdown after this point changes `seen`, so the wait can't miss it
+        unsigned seen = log_ring.published.load(std::memory_order_acquire);
+        bool running = logger_running;
+        while (log_ring.pop(m)) {
+            int n = format_log(m, line, sizeof(line));
+            if (n > 0) {
+                if (write(STDOUT_FILENO, line, min((size_t)n, sizeof(line) - 1)) < 0) { /* stdout gone */ }
+            }
+        }
+        if (!running) break;
+        log_ring.published.wait(seen, std::memory_order_acquire);  // no wake-ups while idle
     }
 }
 
 // --- SIGNAL HANDLER ---
 void signal_handler(int signum) {
-    cout << "\n\nReceived signal " << signum << endl;
-    system_running = false;
+    // Only async-signal-safe calls here: format the number by hand and write()
+    char msg[32] = "\n\nReceived signal ";
+    size_t pos = sizeof("\n\nReceived signal ") - 1;
+    if (signum >= 10) msg[pos++] = '0' + (signum / 10) % 10;
+    msg[pos++] = '0' + signum % 10;
+    msg[pos++] = '\n';
+    if (write(STDOUT_FILENO, msg, pos) < 0) { /* nothing to do */ }
+    request_shutdown();
 }
 
 int main(int argc, char* argv[]) {
+    // Only main() uses cout/cerr (cout before the threads start and after
+    // they join); every worker message, errors included, goes through the
+    // logger, so stdio sync isn't needed
+    std::ios_base::sync_with_stdio(false);
+    std::cin.tie(nullptr);
+
+    shutdown_fd = eventfd(0, EFD_CLOEXEC);
+    lock_memory();
+    calibrate_cycles();
     signal(SIGINT, signal_handler);
     signal(SIGTERM, signal_handler);
     
     int target_core = -1;
     if (argc > 1 && string(argv[1]) == "1") target_core = 0;
 
-    cout << "=== DRONE CORE ONLINE ===" << endl;
-    cout << "Commands: UP/DOWN (throttle), FRONT/BACK (pitch), LEFT/RIGHT (roll), PANIC" << endl;
-    cout << "Press Ctrl+C or send PANIC to shutdown\n" << endl;
+    cout << "=== DRONE CORE ONLINE ===\n";
+    cout << "Commands: UP/DOWN (throttle), FRONT/BACK (pitch), LEFT/RIGHT (roll), PANIC\n";
+    cout << "Press Ctrl+C or send PANIC to shutdown\n\n";
 
-    std::thread t1(task_flight);
+    // SCHED_DEADLINE needs the thread's affinity to span the whole root
+    // domain, and a DEADLINE thread's affinity can't be narrowed afterwards,
+    // so a pinned flight thread has to run FIFO
+    bool flight_edf = (target_core == -1);
+    if (!flight_edf) {
+        cout << "[Scheduler] Flight pinned to core " << target_core << ": SCHED_DEADLINE skipped, using FIFO 50\n";
+    }
+    cout.flush();  // the logger writes straight to fd 1 from here on
+
+    std::thread t1(task_flight, flight_edf);
     std::thread t2(task_vision);
     std::thread t3(task_networking);
     std::thread t4(task_emergency);
     std::thread t5(task_monitor);
+    std::thread t6(task_logger);
 
     set_priority(t4, 90, "Emergency");
-    set_priority(t1, 50, "Flight");
     set_priority(t3, 30, "Networking");
     set_priority(t2, 10, "Vision");
 
     if (target_core != -1) {
-        pin_thread(t1, target_core);
-        pin_thread(t2, target_core);
-        pin_thread(t3, target_core);
-        pin_thread(t4, target_core);
+        pin_thread(t1, target_core, "Flight");
+        pin_thread(t2, target_core, "Vision");
+        pin_thread(t3, target_core, "Networking");
+        pin_thread(t4, target_core, "Emergency");
+        // Keep the logger's formatting and terminal writes off the RT core
+        if (std::thread::hardware_concurrency() > 1) pin_thread(t6, target_core + 1, "Logger");
     }
 
     t1.join(); 
     t2.join(); 
     t3.join(); 
+    wake_emergency();  // Ctrl+C/SIGTERM stop the workers but nothing else wakes t4
     t4.join(); 
     t5.join();
+
+    logger_running = false;
+    log_ring.wake();
+    t6.join();
     
     cleanup_resources();
     
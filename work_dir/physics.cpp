@@ -0,0 +1,11 @@
+// physics.cpp - The only translation unit in libdrone_physics.so
+//
+// Build with ./build_physics.sh. Kept apart from the drone core so the
+// library exports step_physics() and nothing else (no main, no logger ring,
+// no global constructors).
+
+#include "physics.h"
+
+extern "C" void step_physics(float* state, float dt) {
+    step_physics_inline(state, dt);
+}
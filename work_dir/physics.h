@@ -0,0 +1,30 @@
+// physics.h - Flight physics step, shared by the drone core and libdrone_physics.so
+//
+// Flat float layout so the step has a C ABI: the drone core inlines
+// step_physics_inline() (dt is a constant there, so LIFT_K*dt and
+// GRAVITY*dt fold at compile time); physics.cpp wraps it as the extern "C"
+// step_physics() that Python tools load with ctypes/cffi.
+
+#pragma once
+
+#include <cmath>
+
+enum PhysicsIndex { PHYS_THROTTLE, PHYS_PITCH, PHYS_ROLL, PHYS_ALTITUDE, PHYS_VELOCITY, PHYS_COUNT };
+
+constexpr float LIFT_K = 0.25f;   // lift per % throttle
+constexpr float GRAVITY = 9.81f;
+constexpr float TILT_K = 0.005f;  // lift lost per degree of pitch/roll
+
+// v += (throttle*LIFT_K*tilt - g)*dt and alt += v*dt, folded into two FMAs
+static inline void step_physics_inline(float* state, float dt) {
+    float tilt_factor = 1.0f - (std::fabs(state[PHYS_PITCH]) + std::fabs(state[PHYS_ROLL])) * TILT_K;
+
+    float velocity = std::fmaf(state[PHYS_THROTTLE] * tilt_factor, LIFT_K * dt, state[PHYS_VELOCITY] - GRAVITY * dt);
+    float altitude = std::fmaf(velocity, dt, state[PHYS_ALTITUDE]);
+
+    // Ground clamp without branches (max + select)
+    state[PHYS_VELOCITY] = altitude < 0.0f ? 0.0f : velocity;
+    state[PHYS_ALTITUDE] = std::fmax(0.0f, altitude);
+}
+
+extern "C" void step_physics(float* state, float dt);